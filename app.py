@@ -1,8 +1,17 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 from datetime import datetime
+from uwes_core import (
+    QUESTIONS,
+    SCALE_OPTIONS,
+    SCALE_LABELS,
+    SUBSCALE_NAMES,
+    get_score_from_option,
+    get_score_level,
+    calculate_scores,
+    create_radar_chart,
+    create_bar_chart,
+    get_interpretation,
+)
 
 # ページ設定
 st.set_page_config(
@@ -11,147 +20,29 @@ st.set_page_config(
     layout="centered"
 )
 
-# 質問項目の定義
-QUESTIONS = {
-    1: {"text": "仕事をしていると、活力がみなぎるように感じる", "subscale": "活力"},
-    2: {"text": "職場では、元気が出て精力的になるように感じる", "subscale": "活力"},
-    3: {"text": "仕事に熱心である", "subscale": "熱意"},
-    4: {"text": "仕事は、私に活力を与えてくれる", "subscale": "熱意"},
-    5: {"text": "朝に目がさめると、さあ仕事へ行こう、という気持ちになる", "subscale": "活力"},
-    6: {"text": "仕事に没頭しているとき、幸せだと感じる", "subscale": "没頭"},
-    7: {"text": "自分の仕事に誇りを感じる", "subscale": "熱意"},
-    8: {"text": "私は仕事にのめり込んでいる", "subscale": "没頭"},
-    9: {"text": "仕事をしていると、つい夢中になってしまう", "subscale": "没頭"},
-}
-
-# 回答選択肢
-SCALE_OPTIONS = [
-    "0 - 全くない",
-    "1 - 1年に数回以下",
-    "2 - 1ヶ月に1回以下",
-    "3 - 1ヶ月に数回",
-    "4 - 1週間に1回",
-    "5 - 1週間に数回",
-    "6 - 毎日",
-]
-
-def get_score_from_option(option):
-    """選択肢からスコア（数値）を抽出"""
-    return int(option.split(" - ")[0])
-
-def get_score_level(score):
-    """スコア解釈の基準"""
-    if score < 1.0:
-        return "非常に低い"
-    elif score < 2.5:
-        return "低い"
-    elif score < 3.5:
-        return "やや低い"
-    elif score < 4.5:
-        return "平均的"
-    elif score < 5.5:
-        return "高い"
-    else:
-        return "非常に高い"
-
-def calculate_scores(responses):
-    """サブスケールと総合スコアを計算"""
-    vigor_items = [1, 2, 5]
-    dedication_items = [3, 4, 7]
-    absorption_items = [6, 8, 9]
-    
-    vigor_score = sum(responses[i] for i in vigor_items) / len(vigor_items)
-    dedication_score = sum(responses[i] for i in dedication_items) / len(dedication_items)
-    absorption_score = sum(responses[i] for i in absorption_items) / len(absorption_items)
-    total_score = sum(responses.values()) / len(responses)
-    
-    return {
-        "活力 (Vigor)": vigor_score,
-        "熱意 (Dedication)": dedication_score,
-        "没頭 (Absorption)": absorption_score,
-        "総合スコア": total_score
-    }
-
-def create_radar_chart(scores):
-    """レーダーチャートを作成"""
-    categories = ["活力", "熱意", "没頭"]
-    values = [
-        scores["活力 (Vigor)"],
-        scores["熱意 (Dedication)"],
-        scores["没頭 (Absorption)"]
-    ]
-    values.append(values[0])
-    categories.append(categories[0])
-    
-    fig = go.Figure()
-    
-    fig.add_trace(go.Scatterpolar(
-        r=values,
-        theta=categories,
-        fill='toself',
-        fillcolor='rgba(31, 119, 180, 0.3)',
-        line=dict(color='#1f77b4', width=2),
-        name='あなたのスコア'
-    ))
-    
-    fig.update_layout(
-        polar=dict(
-            radialaxis=dict(
-                visible=True,
-                range=[0, 6],
-                tickvals=[0, 1, 2, 3, 4, 5, 6]
-            )
-        ),
-        showlegend=False,
-        margin=dict(l=80, r=80, t=40, b=40),
-        height=400
-    )
-    
-    return fig
+# CSVエクスポートのヘッダー行（BOM付き、列構成は固定）
+CSV_HEADER = "\ufeff診断日時,総合スコア,活力スコア,熱意スコア,没頭スコア," + ",".join(f"Q{q_num}" for q_num in QUESTIONS) + "\n"
 
-def create_bar_chart(scores):
-    """棒グラフを作成"""
-    df = pd.DataFrame({
-        "項目": list(scores.keys()),
-        "スコア": list(scores.values())
-    })
-    
-    fig = px.bar(
-        df, 
-        x="項目", 
-        y="スコア",
-        color="項目",
-        text=df["スコア"].round(2)
-    )
-    
-    fig.update_layout(
-        yaxis_range=[0, 6],
-        showlegend=False,
-        height=350,
-        yaxis_title="スコア (0-6)",
-        xaxis_title=""
-    )
-    
-    fig.update_traces(textposition='outside')
-    
-    return fig
+# 回答詳細データ表の表示設定（列幅と回答の書式）
+DETAIL_COLUMN_CONFIG = {
+    "質問番号": st.column_config.TextColumn(width="small"),
+    "質問内容": st.column_config.TextColumn(width="large"),
+    "サブスケール": st.column_config.TextColumn(width="small"),
+    "回答": st.column_config.NumberColumn(format="%d", width="small"),
+    "回答ラベル": st.column_config.TextColumn(width="medium"),
+}
 
-def get_interpretation(scores):
-    """スコアに基づく解釈を生成"""
-    total = scores["総合スコア"]
-    level = get_score_level(total)
-    
-    interpretations = {
-        "非常に低い": "ワークエンゲージメントが非常に低い状態です。仕事に対するエネルギーや意欲が著しく低下している可能性があります。職場環境や業務内容の見直し、上司や同僚との対話、専門家への相談を検討することをお勧めします。",
-        "低い": "ワークエンゲージメントが低めの状態です。仕事への活力や熱意を取り戻すために、業務の優先順位の見直しや、達成感を得られる小さな目標設定から始めてみることをお勧めします。",
-        "やや低い": "ワークエンゲージメントがやや低い状態です。仕事の意義ややりがいを再確認し、強みを活かせる業務に注力することで、エンゲージメントの向上が期待できます。",
-        "平均的": "ワークエンゲージメントは平均的なレベルです。現状を維持しながら、より充実した仕事経験を得るために、新しいチャレンジやスキルアップの機会を探してみてはいかがでしょうか。",
-        "高い": "ワークエンゲージメントが高い状態です。仕事に対してポジティブな感情を持ち、活力に満ちた状態と言えます。この良い状態を維持するために、適度な休息も大切にしてください。",
-        "非常に高い": "ワークエンゲージメントが非常に高い状態です。仕事に対して強い情熱とエネルギーを持っています。素晴らしい状態ですが、燃え尽き症候群を防ぐため、ワークライフバランスにも注意を払いましょう。"
-    }
-    
-    return interpretations.get(level, "")
+@st.cache_data(max_entries=128)
+def make_csv(timestamp, responses_items):
+    """エクスポート用CSVのバイト列を作成（診断日時と回答をキーにキャッシュ）"""
+    responses = dict(responses_items)
+    scores = calculate_scores(responses)
+    export_values = [timestamp, scores["総合スコア"]]
+    export_values.extend(scores[name] for name in SUBSCALE_NAMES)
+    export_values.extend(responses[q_num] for q_num in QUESTIONS)
+    return (CSV_HEADER + ",".join(map(str, export_values)) + "\n").encode('utf-8')
 
+@st.fragment
 def show_survey():
     """診断画面を表示"""
     st.markdown("### 📝 診断")
@@ -161,41 +52,50 @@ def show_survey():
     
     responses = {}
     
-    for q_num, q_data in QUESTIONS.items():
-        st.markdown(f"**Q{q_num}. {q_data['text']}**")
-        
-        response = st.radio(
-            f"Q{q_num}の回答",
-            options=SCALE_OPTIONS,
-            index=None,
-            key=f"radio_{q_num}",
-            label_visibility="collapsed"
-        )
-        
-        if response is not None:
-            responses[q_num] = get_score_from_option(response)
-        else:
-            responses[q_num] = None
-        
-        st.divider()
-    
-    col1, col2, col3 = st.columns([1, 2, 1])
-    with col2:
-        if st.button("🔍 結果を見る", use_container_width=True, type="primary"):
-            unanswered = [q for q, r in responses.items() if r is None]
-            if unanswered:
-                st.error(f"⚠️ Q{', Q'.join(map(str, unanswered))} が未回答です。すべての質問に回答してください。")
+    # フォーム内の回答は送信時までリランを発生させない
+    with st.form("survey_form", border=False):
+        for q_num, q_data in QUESTIONS.items():
+            st.markdown(f"**Q{q_num}. {q_data['text']}**")
+            
+            response = st.radio(
+                f"Q{q_num}の回答",
+                options=SCALE_OPTIONS,
+                index=None,
+                key=f"radio_{q_num}",
+                label_visibility="collapsed"
+            )
+            
+            if response is not None:
+                responses[q_num] = get_score_from_option(response)
             else:
-                st.session_state.responses = responses
-                st.session_state.page = "result"
-                st.rerun()
+                responses[q_num] = None
+            
+            st.divider()
+        
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col2:
+            if st.form_submit_button("🔍 結果を見る", use_container_width=True, type="primary"):
+                unanswered = [q for q, r in responses.items() if r is None]
+                if unanswered:
+                    st.error(f"⚠️ Q{', Q'.join(map(str, unanswered))} が未回答です。すべての質問に回答してください。")
+                else:
+                    st.session_state.responses = responses
+                    st.session_state.pop('result_ts', None)
+                    st.session_state.page = "result"
+                    st.rerun()
 
+@st.fragment
 def show_result():
     """結果画面を表示"""
     scores = calculate_scores(st.session_state.responses)
     
+    # 診断日時は初回表示時に固定し、リランをまたいで同じ値を使う
+    if 'result_ts' not in st.session_state:
+        st.session_state.result_ts = datetime.now()
+    result_ts = st.session_state.result_ts
+    
     st.markdown("### 📊 あなたの診断結果")
-    st.caption(f"診断日時: {datetime.now().strftime('%Y年%m月%d日 %H:%M')}")
+    st.caption(f"診断日時: {result_ts.strftime('%Y年%m月%d日 %H:%M')}")
     
     st.divider()
     
@@ -214,44 +114,29 @@ def show_result():
     # サブスケール別スコア
     st.markdown("#### サブスケール別スコア")
     
-    col1, col2, col3 = st.columns(3)
-    
-    with col1:
-        vigor_level = get_score_level(scores["活力 (Vigor)"])
-        st.metric(
-            label="活力 (Vigor)",
-            value=f"{scores['活力 (Vigor)']:.2f}",
-            delta=vigor_level
-        )
-    
-    with col2:
-        dedication_level = get_score_level(scores["熱意 (Dedication)"])
-        st.metric(
-            label="熱意 (Dedication)",
-            value=f"{scores['熱意 (Dedication)']:.2f}",
-            delta=dedication_level
-        )
-    
-    with col3:
-        absorption_level = get_score_level(scores["没頭 (Absorption)"])
-        st.metric(
-            label="没頭 (Absorption)",
-            value=f"{scores['没頭 (Absorption)']:.2f}",
-            delta=absorption_level
-        )
+    for col, name in zip(st.columns(3), SUBSCALE_NAMES):
+        with col:
+            st.metric(
+                label=name,
+                value=f"{scores[name]:.2f}",
+                delta=get_score_level(scores[name])
+            )
     
     st.divider()
     
-    # グラフ
+    # グラフ（キャッシュヒット率を上げるため小数第2位で丸める）
+    vigor, dedication, absorption = (round(scores[name], 2) for name in SUBSCALE_NAMES)
+    total = round(scores["総合スコア"], 2)
+    
     col1, col2 = st.columns(2)
     
     with col1:
         st.markdown("#### レーダーチャート")
-        st.plotly_chart(create_radar_chart(scores), use_container_width=True)
+        st.plotly_chart(create_radar_chart(vigor, dedication, absorption), use_container_width=True)
     
     with col2:
         st.markdown("#### スコア比較")
-        st.plotly_chart(create_bar_chart(scores), use_container_width=True)
+        st.plotly_chart(create_bar_chart(vigor, dedication, absorption, total), use_container_width=True)
     
     # 解釈
     st.markdown("### 💡 結果の解釈")
@@ -267,31 +152,28 @@ def show_result():
                 "質問内容": QUESTIONS[q_num]["text"],
                 "サブスケール": QUESTIONS[q_num]["subscale"],
                 "回答": response,
-                "回答ラベル": SCALE_OPTIONS[response].split(" - ")[1]
+                "回答ラベル": SCALE_LABELS[response]
             })
-        st.dataframe(pd.DataFrame(detail_data), use_container_width=True, hide_index=True)
+        st.dataframe(
+            detail_data,
+            use_container_width=True,
+            hide_index=True,
+            column_config=DETAIL_COLUMN_CONFIG
+        )
     
     # データエクスポート
     st.divider()
     st.markdown("### 📥 データエクスポート")
     
-    export_data = {
-        "診断日時": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-        "総合スコア": scores["総合スコア"],
-        "活力スコア": scores["活力 (Vigor)"],
-        "熱意スコア": scores["熱意 (Dedication)"],
-        "没頭スコア": scores["没頭 (Absorption)"],
-    }
-    for q_num, response in st.session_state.responses.items():
-        export_data[f"Q{q_num}"] = response
-    
-    df_export = pd.DataFrame([export_data])
-    csv = df_export.to_csv(index=False).encode('utf-8-sig')
+    csv_bytes = make_csv(
+        result_ts.strftime('%Y-%m-%d %H:%M:%S'),
+        tuple(sorted(st.session_state.responses.items()))
+    )
     
     st.download_button(
         label="📄 CSVでダウンロード",
-        data=csv,
-        file_name=f"uwes_result_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+        data=csv_bytes,
+        file_name=f"uwes_result_{result_ts.strftime('%Y%m%d_%H%M%S')}.csv",
         mime="text/csv"
     )
     
@@ -303,6 +185,33 @@ def show_result():
             del st.session_state[key]
         st.rerun()
 
+@st.cache_data
+def get_subscale_table():
+    """サブスケール説明表を作成（静的データのためキャッシュ）"""
+    # pandasはUWES説明画面でのみ必要なため遅延インポート
+    import pandas as pd
+    
+    return pd.DataFrame({
+        "サブスケール": list(SUBSCALE_NAMES),
+        "説明": [
+            "仕事中の高い水準のエネルギーや心理的な回復力",
+            "仕事への強い関与、意義・熱意・誇りの感覚",
+            "仕事に集中し、没頭している状態"
+        ],
+        "質問番号": ["Q1, Q2, Q5", "Q3, Q4, Q7", "Q6, Q8, Q9"]
+    })
+
+@st.cache_data
+def get_score_level_table():
+    """スコア解釈目安表を作成（静的データのためキャッシュ）"""
+    import pandas as pd
+    
+    return pd.DataFrame({
+        "スコア範囲": ["0.0 - 0.9", "1.0 - 2.4", "2.5 - 3.4", "3.5 - 4.4", "4.5 - 5.4", "5.5 - 6.0"],
+        "レベル": ["非常に低い", "低い", "やや低い", "平均的", "高い", "非常に高い"]
+    })
+
+@st.fragment
 def show_about():
     """UWESについての説明を表示"""
     st.markdown("### ℹ️ UWESについて")
@@ -324,24 +233,11 @@ def show_about():
     
     st.markdown("#### 3つのサブスケール")
     
-    subscale_df = pd.DataFrame({
-        "サブスケール": ["活力 (Vigor)", "熱意 (Dedication)", "没頭 (Absorption)"],
-        "説明": [
-            "仕事中の高い水準のエネルギーや心理的な回復力",
-            "仕事への強い関与、意義・熱意・誇りの感覚",
-            "仕事に集中し、没頭している状態"
-        ],
-        "質問番号": ["Q1, Q2, Q5", "Q3, Q4, Q7", "Q6, Q8, Q9"]
-    })
-    st.dataframe(subscale_df, use_container_width=True, hide_index=True)
+    st.dataframe(get_subscale_table(), use_container_width=True, hide_index=True)
     
     st.markdown("#### スコアの解釈目安")
     
-    score_df = pd.DataFrame({
-        "スコア範囲": ["0.0 - 0.9", "1.0 - 2.4", "2.5 - 3.4", "3.5 - 4.4", "4.5 - 5.4", "5.5 - 6.0"],
-        "レベル": ["非常に低い", "低い", "やや低い", "平均的", "高い", "非常に高い"]
-    })
-    st.dataframe(score_df, use_container_width=True, hide_index=True)
+    st.dataframe(get_score_level_table(), use_container_width=True, hide_index=True)
     
     st.markdown("#### 出典・参考文献")
     
@@ -381,20 +277,23 @@ def main():
     with st.sidebar:
         st.markdown("### メニュー")
         
+        # 表示中のページへの遷移ではリランしない
         if st.button("📝 診断", use_container_width=True):
-            st.session_state.page = "survey"
-            st.rerun()
+            if st.session_state.page != "survey":
+                st.session_state.page = "survey"
+                st.rerun()
         
         if st.button("📈 結果", use_container_width=True):
-            if st.session_state.responses:
+            if not st.session_state.responses:
+                st.warning("先に診断を完了してください")
+            elif st.session_state.page != "result":
                 st.session_state.page = "result"
                 st.rerun()
-            else:
-                st.warning("先に診断を完了してください")
         
         if st.button("ℹ️ UWESについて", use_container_width=True):
-            st.session_state.page = "about"
-            st.rerun()
+            if st.session_state.page != "about":
+                st.session_state.page = "about"
+                st.rerun()
         
         st.divider()
         st.caption("© Schaufeli & Bakker (2003)")
@@ -0,0 +1,150 @@
+"""UWES-9の質問定義・スコア計算・グラフ作成の共通処理（グラフはst.cache_dataでキャッシュ）"""
+
+import bisect
+
+import streamlit as st
+
+# 質問項目の定義
+QUESTIONS = {
+    1: {"text": "仕事をしていると、活力がみなぎるように感じる", "subscale": "活力"},
+    2: {"text": "職場では、元気が出て精力的になるように感じる", "subscale": "活力"},
+    3: {"text": "仕事に熱心である", "subscale": "熱意"},
+    4: {"text": "仕事は、私に活力を与えてくれる", "subscale": "熱意"},
+    5: {"text": "朝に目がさめると、さあ仕事へ行こう、という気持ちになる", "subscale": "活力"},
+    6: {"text": "仕事に没頭しているとき、幸せだと感じる", "subscale": "没頭"},
+    7: {"text": "自分の仕事に誇りを感じる", "subscale": "熱意"},
+    8: {"text": "私は仕事にのめり込んでいる", "subscale": "没頭"},
+    9: {"text": "仕事をしていると、つい夢中になってしまう", "subscale": "没頭"},
+}
+
+# 回答選択肢（全ての質問で共有する不変のシーケンス）
+SCALE_OPTIONS = (
+    "0 - 全くない",
+    "1 - 1年に数回以下",
+    "2 - 1ヶ月に1回以下",
+    "3 - 1ヶ月に数回",
+    "4 - 1週間に1回",
+    "5 - 1週間に数回",
+    "6 - 毎日",
+)
+
+# 回答ラベル（スコア順）
+SCALE_LABELS = (
+    "全くない",
+    "1年に数回以下",
+    "1ヶ月に1回以下",
+    "1ヶ月に数回",
+    "1週間に1回",
+    "1週間に数回",
+    "毎日",
+)
+
+# サブスケール名（calculate_scoresの戻り値のキー、表示順）
+SUBSCALE_NAMES = ("活力 (Vigor)", "熱意 (Dedication)", "没頭 (Absorption)")
+
+# 選択肢 → スコアの対応表
+OPTION_TO_SCORE = {option: i for i, option in enumerate(SCALE_OPTIONS)}
+
+def get_score_from_option(option):
+    """選択肢からスコア（数値）を取得"""
+    return OPTION_TO_SCORE[option]
+
+# スコア解釈の閾値とレベル（閾値未満で左側のレベルになる）
+_LEVEL_THRESHOLDS = (1.0, 2.5, 3.5, 4.5, 5.5)
+_LEVELS = ("非常に低い", "低い", "やや低い", "平均的", "高い", "非常に高い")
+
+def get_score_level(score):
+    """スコア解釈の基準"""
+    return _LEVELS[bisect.bisect_right(_LEVEL_THRESHOLDS, score)]
+
+def calculate_scores(responses):
+    """サブスケールと総合スコアを計算"""
+    # 活力: Q1, Q2, Q5 / 熱意: Q3, Q4, Q7 / 没頭: Q6, Q8, Q9
+    vigor = responses[1] + responses[2] + responses[5]
+    dedication = responses[3] + responses[4] + responses[7]
+    absorption = responses[6] + responses[8] + responses[9]
+    
+    scores = dict(zip(SUBSCALE_NAMES, (vigor / 3, dedication / 3, absorption / 3)))
+    scores["総合スコア"] = (vigor + dedication + absorption) / 9
+    
+    return scores
+
+@st.cache_data(max_entries=128)
+def create_radar_chart(vigor, dedication, absorption):
+    """レーダーチャートを作成（スコアをキーにキャッシュ）"""
+    # Plotlyは結果画面でのみ必要なため遅延インポート
+    import plotly.graph_objects as go
+    
+    categories = ["活力", "熱意", "没頭"]
+    values = [vigor, dedication, absorption]
+    values.append(values[0])
+    categories.append(categories[0])
+    
+    fig = go.Figure()
+    
+    fig.add_trace(go.Scatterpolar(
+        r=values,
+        theta=categories,
+        fill='toself',
+        fillcolor='rgba(31, 119, 180, 0.3)',
+        line=dict(color='#1f77b4', width=2),
+        name='あなたのスコア'
+    ))
+    
+    fig.update_layout(
+        polar=dict(
+            radialaxis=dict(
+                visible=True,
+                range=[0, 6],
+                tickvals=[0, 1, 2, 3, 4, 5, 6]
+            )
+        ),
+        showlegend=False,
+        margin=dict(l=80, r=80, t=40, b=40),
+        height=400
+    )
+    
+    return fig
+
+@st.cache_data(max_entries=128)
+def create_bar_chart(vigor, dedication, absorption, total):
+    """棒グラフを作成（スコアをキーにキャッシュ）"""
+    import plotly.express as px
+    
+    scores = dict(zip(SUBSCALE_NAMES, (vigor, dedication, absorption)))
+    scores["総合スコア"] = total
+    labels = list(scores.keys())
+    
+    fig = px.bar(
+        x=labels,
+        y=list(scores.values()),
+        color=labels,
+        text_auto=True,
+        labels={"x": "項目", "y": "スコア", "color": "項目"}
+    )
+    
+    fig.update_layout(
+        yaxis_range=[0, 6],
+        showlegend=False,
+        height=350,
+        yaxis_title="スコア (0-6)",
+        xaxis_title=""
+    )
+    
+    fig.update_traces(textposition='outside')
+    
+    return fig
+
+# スコアレベルごとの解釈文
+INTERPRETATIONS = {
+    "非常に低い": "ワークエンゲージメントが非常に低い状態です。仕事に対するエネルギーや意欲が著しく低下している可能性があります。職場環境や業務内容の見直し、上司や同僚との対話、専門家への相談を検討することをお勧めします。",
+    "低い": "ワークエンゲージメントが低めの状態です。仕事への活力や熱意を取り戻すために、業務の優先順位の見直しや、達成感を得られる小さな目標設定から始めてみることをお勧めします。",
+    "やや低い": "ワークエンゲージメントがやや低い状態です。仕事の意義ややりがいを再確認し、強みを活かせる業務に注力することで、エンゲージメントの向上が期待できます。",
+    "平均的": "ワークエンゲージメントは平均的なレベルです。現状を維持しながら、より充実した仕事経験を得るために、新しいチャレンジやスキルアップの機会を探してみてはいかがでしょうか。",
+    "高い": "ワークエンゲージメントが高い状態です。仕事に対してポジティブな感情を持ち、活力に満ちた状態と言えます。この良い状態を維持するために、適度な休息も大切にしてください。",
+    "非常に高い": "ワークエンゲージメントが非常に高い状態です。仕事に対して強い情熱とエネルギーを持っています。素晴らしい状態ですが、燃え尽き症候群を防ぐため、ワークライフバランスにも注意を払いましょう。"
+}
+
+def get_interpretation(scores):
+    """スコアに基づく解釈を生成"""
+    return INTERPRETATIONS.get(get_score_level(scores["総合スコア"]), "")